@@ -3,10 +3,13 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import glob
+
 from spack import *
+from spack.pkg.plato.plato_build_utils import CompilerLauncherPackage
 
 
-class Arborx(CMakePackage):
+class Arborx(CMakePackage, CompilerLauncherPackage):
     """ArborX is a performance-portable library for geometric search"""
 
     homepage = "http://github.com/arborx/arborx"
@@ -14,6 +17,7 @@ class Arborx(CMakePackage):
     git      = "https://github.com/arborx/arborx.git"
 
     version('master', branch='master')
+    version('v1.4', tag='v1.4')
     version('v1.1', sha256='2b5f2d2d5cec57c52f470c2bf4f42621b40271f870b4f80cb57e52df1acd90ce')
     version('header_only', commit='3158660351d69456cc9310c7b325cff7859b90a8')
     version('0.8-beta2', sha256='e68733bc77fbb84313f3ff059f746fa79ab2ffe24a0a391126eefa47ec4fd2df')
@@ -22,8 +26,33 @@ class Arborx(CMakePackage):
     variant('openmp', default=False, description='enable OpenMP backend')
     variant('serial', default=True, description='enable Serial backend (default)')
     variant('mpi', default=True, description='enable MPI')
+    variant('trilinos', default=False, description='use the Kokkos built into Trilinos')
+    variant('benchmarks', default=False, description='build and install the BVH benchmarks')
+
+    # Without a backend ArborX is built header-only and doesn't use Kokkos
+    for _backend in ('serial', 'openmp', 'cuda'):
+        depends_on('trilinos+kokkos', when='+trilinos+' + _backend)
+        depends_on('kokkos+' + _backend, when='~trilinos+' + _backend)
+    # The releases before 1.4 use Kokkos 3 APIs that Kokkos 4 removed
+    for _version in ('v1.1', 'header_only', '0.8-beta2'):
+        depends_on('kokkos@3.1:3', when='@{0} ~trilinos'.format(_version))
+        conflicts('^trilinos@14:', when='@{0} +trilinos'.format(_version),
+                  msg='ArborX before 1.4 does not build with the Kokkos 4 of Trilinos 14 and newer')
+    depends_on('kokkos@3.7.01:', when='@v1.4 ~trilinos')
+    conflicts('^trilinos@:13', when='@v1.4 +trilinos', msg='ArborX 1.4 needs Kokkos 3.7.01 or newer')
+    depends_on('trilinos+openmp', when='+trilinos+openmp')
+    depends_on('trilinos+cuda+wrapper', when='+trilinos+cuda')
+    depends_on('kokkos+cuda_lambda+wrapper', when='~trilinos+cuda')
+    conflicts('+trilinos', when='~serial~openmp~cuda', msg='the header-only build does not use Kokkos')
+    conflicts('+benchmarks', when='~serial~openmp~cuda', msg='the benchmarks need a Kokkos backend')
+    # Only the patched releases can be built header-only
+    conflicts('~serial~openmp~cuda', when='@v1.4', msg='ArborX 1.4 needs a Kokkos backend')
+
+    depends_on('benchmark', when='+benchmarks')
+    depends_on('boost+program_options', when='+benchmarks')
 
     depends_on('cmake@3.12:', type='build')
+    depends_on('cmake@3.16:', type='build', when='@v1.4')
     depends_on('cuda', when='+cuda')
     depends_on('mpi', when='+mpi')
 
@@ -36,22 +65,48 @@ class Arborx(CMakePackage):
         options = [
             '-DARBORX_ENABLE_TESTS=OFF',
             '-DARBORX_ENABLE_EXAMPLES=OFF',
-            '-DARBORX_ENABLE_BENCHMARKS=OFF',
+            '-DARBORX_ENABLE_BENCHMARKS=%s' % ('ON' if '+benchmarks' in spec else 'OFF'),
             '-DARBORX_ENABLE_MPI=%s' % ('ON' if '+mpi' in spec else 'OFF')
         ]
 
         if '+cuda' in spec or '+serial' in spec or '+openmp' in spec:
-            '-DCMAKE_PREFIX_PATH=%s' % spec['kokkos'].prefix,
-            nvcc_wrapper_path = spec['kokkos'].prefix.bin.nvcc_wrapper
-            options.append('-DCMAKE_CXX_COMPILER=%s' % nvcc_wrapper_path)
+            kokkos = spec['trilinos' if '+trilinos' in spec else 'kokkos']
+            options.append('-DKokkos_ROOT=%s' % kokkos.prefix)
+            if '+cuda' in spec:
+                options.append('-DCMAKE_CXX_COMPILER=%s' % kokkos.kokkos_cxx)
         else:
             options.append('-DARBORX_ENABLE_HEADERONLY=ON')
 
+        options.extend(self.compiler_launcher_args())
+
         return options
 
+    @run_after('install')
+    def install_benchmarks(self):
+        # The benchmarks have no install rules
+        if '+benchmarks' not in self.spec:
+            return
+        mkdirp(self.prefix.bin)
+        for exe in glob.glob(join_path(self.build_directory, 'benchmarks', '**', 'ArborX_*.exe'),
+                             recursive=True):
+            install(exe, self.prefix.bin)
+
+    # Problem sizes (number of values and of queries) of the BVH benchmark
+    benchmark_sizes = [10000, 100000, 1000000]
+
+    def test(self):
+        if '+benchmarks' not in self.spec:
+            return
+        # ArborX_BoundingVolumeHierarchy.exe, ArborX_Benchmark_... in later releases
+        exe = glob.glob(join_path(self.prefix.bin, 'ArborX_*BoundingVolumeHierarchy.exe'))[0]
+        for n in self.benchmark_sizes:
+            self.run_test(exe, ['--values=%d' % n, '--queries=%d' % n],
+                          purpose='BVH construction and queries with %d values' % n)
+
     def setup_run_environment(self, run_env):
         run_env.prepend_path('CPATH', join_path(self.prefix, 'include', 'details'))
 
     def setup_build_environment(self, spack_env):
         spack_env.prepend_path('CPATH', join_path(self.prefix, 'include'))
         spack_env.prepend_path('CPATH', join_path(self.prefix, 'include', 'details'))
+        self.setup_compiler_launcher_environment(spack_env)
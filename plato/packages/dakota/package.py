@@ -3,10 +3,13 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+import time
+
 from spack import *
+from spack.pkg.plato.plato_build_utils import CompilerLauncherPackage
 
 
-class Dakota(CMakePackage):
+class Dakota(CMakePackage, CompilerLauncherPackage):
     """The Dakota toolkit provides a flexible, extensible interface between
     analysis codes and iterative systems analysis methods. Dakota
     contains algorithms for:
@@ -38,14 +41,16 @@ class Dakota(CMakePackage):
             description='Enables the build of shared libraries')
     variant('mpi', default=True, description='Activates MPI support')
     variant('use_spack_trilinos', default=True, description='Instructs dakota to link to the version of Trilinos installed by spack rather than the snapshot included in its source code')
+    variant('hdf5', default=False, description='Enables the HDF5 results database')
 
-    # Generic 'lapack' provider won't work, dakota searches for
-    # 'LAPACKConfig.cmake' or 'lapack-config.cmake' on the path
-    depends_on('netlib-lapack')
-
+    # Any provider works; BLAS_LIBS and LAPACK_LIBS keep dakota from
+    # searching for 'LAPACKConfig.cmake' or 'lapack-config.cmake'
+    depends_on('lapack')
     depends_on('blas')
     depends_on('mpi', when='+mpi')
     depends_on('trilinos+teuchos+rol+mpi', when='+use_spack_trilinos')
+    # The results database uses the HDF5 C++ and high-level APIs
+    depends_on('hdf5+hl+cxx', when='+hdf5')
 
     depends_on('python')
     depends_on('perl-data-dumper', type='build', when='@6.12:')
@@ -55,12 +60,16 @@ class Dakota(CMakePackage):
 
     patch('616.patch', when='@6.16:')
 
+    conflicts('+hdf5', when='@:6.8', msg='The HDF5 results database was added in Dakota 6.9')
+
     def cmake_args(self):
         spec = self.spec
 
         args = [
             '-DBUILD_SHARED_LIBS:BOOL=%s' % (
                 'ON' if '+shared' in spec else 'OFF'),
+            '-DBLAS_LIBS:STRING=%s' % spec['blas'].libs.joined(';'),
+            '-DLAPACK_LIBS:STRING=%s' % spec['lapack'].libs.joined(';'),
         ]
 
         if '+mpi' in spec:
@@ -79,8 +88,32 @@ class Dakota(CMakePackage):
                 '-DDAKOTA_NO_FIND_TRILINOS:BOOL=TRUE'
             ])
 
+        if '+hdf5' in spec:
+            args.extend([
+                '-DDAKOTA_HAVE_HDF5:BOOL=ON',
+                '-DHDF5_ROOT:PATH=%s' % spec['hdf5'].prefix
+            ])
+        else:
+            args.extend([
+                '-DDAKOTA_HAVE_HDF5:BOOL=OFF'
+            ])
+
+        args.extend(self.compiler_launcher_args())
+
         return args
 
+    def setup_build_environment(self, env):
+        self.setup_compiler_launcher_environment(env)
+
+    def test(self):
+        # Time a Gaussian process surrogate fit and its sampling, which
+        # spend most of their time in BLAS/LAPACK
+        input_file = join_path(self.package_dir, 'test', 'gp_surrogate.in')
+        start = time.time()
+        self.run_test('dakota', ['-i', input_file, '-o', 'gp_surrogate.out'],
+                      purpose='timing a Gaussian process surrogate build')
+        print('Gaussian process surrogate: {0:.2f} s'.format(time.time() - start))
+
     def url_for_version(self, version):
         url = 'https://github.com/snl-dakota/dakota/releases/download/v{0}.0/dakota-{0}.0-public-src-cli.tar.gz'
         return url.format(version)
@@ -1,5 +1,8 @@
+import os
+import struct
 from distutils.dir_util import copy_tree
 from spack import *
+from spack.pkg.plato.plato_build_utils import check_loader_lookups
 
 class Esp(Package):
     """Engineering SketchPad by Bob Haimes at MIT"""
@@ -24,6 +27,8 @@ class Esp(Package):
     depends_on( 'python@3.10.6', type=('run'), when='@BetaLin-2023-10-11' )
     depends_on( 'python@3.10.6', type=('run'), when='@BetaLin-2023-11-09' )
 
+    depends_on( 'patchelf', type='build' )
+
     phases = ['install']
 
 
@@ -54,9 +59,55 @@ class Esp(Package):
 
       copy_tree('EngSketchPad/ESP', prefix.ESP)
 
-    def setup_run_environment(self, run_env):
+    @run_after('install')
+    def set_runpath(self):
+      # The prebuilt binaries expect LD_LIBRARY_PATH; point them at the
+      # installed lib directory instead, relative to their own location
+      patchelf = which('patchelf', required=True)
+      for root, dirs, files in os.walk(self.prefix):
+        for name in files:
+          path = os.path.join(root, name)
+          if os.path.islink(path) or not self._is_dynamic_elf(path):
+            continue
+          rel = os.path.relpath(self.prefix.lib, root)
+          runpath = '$ORIGIN' if rel == '.' else '$ORIGIN/' + rel
+          patchelf('--set-rpath', runpath, path)
+
+    @staticmethod
+    def _is_dynamic_elf(path):
+      # Only dynamically linked executables and shared objects can take a
+      # RUNPATH; object files and static executables have no .dynamic
+      with open(path, 'rb') as f:
+        ident = f.read(16)
+        if len(ident) < 16 or ident[:4] != b'\x7fELF':
+          return False
+        bits64 = ident[4] == 2
+        order = '<' if ident[5] == 1 else '>'
+        header = f.read(48 if bits64 else 36)
+        e_type = struct.unpack(order + 'H', header[0:2])[0]
+        if e_type not in (2, 3):  # ET_EXEC, ET_DYN
+          return False
+        if bits64:
+          phoff = struct.unpack(order + 'Q', header[16:24])[0]
+          phentsize, phnum = struct.unpack(order + 'HH', header[38:42])
+        else:
+          phoff = struct.unpack(order + 'I', header[12:16])[0]
+          phentsize, phnum = struct.unpack(order + 'HH', header[26:30])
+        for i in range(phnum):
+          f.seek(phoff + i * phentsize)
+          if struct.unpack(order + 'I', f.read(4))[0] == 2:  # PT_DYNAMIC
+            return True
+      return False
+
+    def test(self):
+      # The installed RUNPATHs alone must resolve the ESP libraries
+      for exe in ('serveESP', 'serveCSM'):
+        path = join_path(self.prefix.bin, exe)
+        if os.path.isfile(path):
+          check_loader_lookups(path, trace_only=True)
+          break
 
-      run_env.prepend_path('LD_LIBRARY_PATH', self.prefix.lib)
+    def setup_run_environment(self, run_env):
 
       if (self.spec.satisfies('@117Lin')):
         run_env.prepend_path('PYTHONPATH', self.prefix.lib)
@@ -23,9 +23,10 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 from spack import *
+from spack.pkg.plato.plato_build_utils import CompilerLauncherPackage
 
 
-class Exo2obj(CMakePackage):
+class Exo2obj(CMakePackage, CompilerLauncherPackage):
     """exo2obj"""
 
     homepage = "https://github.com/platoengine/exo2obj"
@@ -36,14 +37,28 @@ class Exo2obj(CMakePackage):
 
     version('release', branch='release')
 
-    depends_on('seacas~mpi')
+    # MPI by default, like Trilinos, so both can share one SEACAS
+    variant('mpi', default=True, description='Use an MPI-enabled SEACAS, e.g. the one shared with Trilinos')
+
+    depends_on('seacas~mpi', when='~mpi')
+    depends_on('seacas+mpi', when='+mpi')
+    depends_on('mpi',        when='+mpi')
 
     def cmake_args(self):
         spec = self.spec
         options = []
 
+        if '+mpi' in spec:
+          options.extend([ '-DCMAKE_C_COMPILER={0}'.format(spec['mpi'].mpicc) ])
+          options.extend([ '-DCMAKE_CXX_COMPILER={0}'.format(spec['mpi'].mpicxx) ])
+
+        options.extend(self.compiler_launcher_args())
+
         return options
 
+    def setup_build_environment(self, env):
+        self.setup_compiler_launcher_environment(env)
+
     def setup_run_environment(self, run_env):
 
         run_env.prepend_path('PATH', self.prefix.bin)
@@ -21,12 +21,13 @@
 # ----------------------------------------------------------------------------
 
 from spack import *
+from spack.pkg.plato.plato_build_utils import CompilerLauncherPackage
 
 import os
 import re
 import subprocess
 
-class Moris(CMakePackage):
+class Moris(CMakePackage, CompilerLauncherPackage):
     """MORIS"""
 
     git      = "ssh://git@github.com/kkmaute/moris"
@@ -129,6 +130,8 @@ class Moris(CMakePackage):
         if '-examples' in spec:
             options.extend([ '-DMORIS_USE_EXAMPLES=OFF' ])
 
+        options.extend(self.compiler_launcher_args())
+
         return options
     
     def setup_build_environment(self, env):
@@ -156,3 +159,5 @@ class Moris(CMakePackage):
         if '+openblas' in self.spec:
             # TODO: This is untested
             env.set('OPENBLAS_DIR', self.spec['blas'].prefix)
+
+        self.setup_compiler_launcher_environment(env)
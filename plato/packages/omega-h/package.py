@@ -3,8 +3,10 @@
 #
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
+from spack.pkg.plato.plato_build_utils import CompilerLauncherPackage
 
-class OmegaH(CMakePackage, CudaPackage):
+
+class OmegaH(CMakePackage, CudaPackage, CompilerLauncherPackage):
     """Omega_h is a C++11 library providing data structures and algorithms
     for adaptive discretizations. Its specialty is anisotropic triangle and
     tetrahedral mesh adaptation. It runs efficiently on most modern HPC
@@ -101,8 +103,12 @@ class OmegaH(CMakePackage, CudaPackage):
         # omega-h requires empty CMAKE_BUILD_TYPE
         args.append('-DCMAKE_BUILD_TYPE:STRING=')
         args += list(self._bob_options())
+        args += self.compiler_launcher_args()
         return args
 
+    def setup_build_environment(self, env):
+        self.setup_compiler_launcher_environment(env)
+
     def flag_handler(self, name, flags):
         flags = list(flags)
         if name == 'cxxflags':
@@ -0,0 +1,311 @@
+# Copyright 2013-2023 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+
+import glob
+import hashlib
+import os
+import shutil
+import time
+
+import spack.compilers
+import spack.package_base
+import spack.paths
+import spack.stage
+from spack.package import *
+
+# Build-system mixins shared by the Plato recipes. Recipes import them with
+#
+#     from spack.pkg.plato.plato_build_utils import PgoPackage
+#
+# and list them as base classes, the same way CudaPackage is used.
+
+
+class PlatoBuildUtils(BundlePackage):
+    """Shared build helpers for the Plato recipes. Installing this package
+    does nothing; it only exists so the helpers can be imported."""
+
+    homepage = "https://github.com/sandialabs/plato-spack-repo"
+
+    version("1.0")
+
+
+class PgoPackage(spack.package_base.PackageBase):
+    """Two-stage profile-guided optimization.
+
+    ``pgo=generate`` builds instrumented binaries that write profiles into a
+    per-package directory in the Spack user cache. ``pgo=use`` rebuilds with
+    those profiles. The profile directory is keyed by the configuration
+    (variants other than ``pgo``, flags and target) rather than the spec
+    hash, so the profiles survive uninstalls and can be reused by later
+    rebuilds of the same configuration.
+    """
+
+    variant(
+        "pgo",
+        default="none",
+        values=("none", "generate", "use"),
+        multi=False,
+        description="Profile-guided optimization stage",
+    )
+
+    for _compiler in spack.compilers.supported_compilers():
+        if _compiler not in ("gcc", "clang"):
+            conflicts(
+                "pgo=generate",
+                when="%" + _compiler,
+                msg="profile-guided optimization is only supported with GCC and Clang",
+            )
+            conflicts(
+                "pgo=use",
+                when="%" + _compiler,
+                msg="profile-guided optimization is only supported with GCC and Clang",
+            )
+    # -fprofile-prefix-path is needed to match profiles across stage directories
+    conflicts("pgo=generate", when="%gcc@:10")
+    conflicts("pgo=use", when="%gcc@:10")
+
+    # Variants that don't change the compiled code
+    _pgo_neutral_variants = ("pgo", "compiler_launcher")
+
+    def _pgo_config_hash(self):
+        spec = self.spec
+        key = [str(spec.target)]
+        key.extend(
+            "{0}={1}".format(name, variant.value)
+            for name, variant in sorted(spec.variants.items())
+            if name not in self._pgo_neutral_variants
+        )
+        key.extend("{0}={1}".format(k, " ".join(v)) for k, v in sorted(spec.compiler_flags.items()))
+        return hashlib.sha256(" ".join(key).encode("utf-8")).hexdigest()[:8]
+
+    @property
+    def pgo_profile_dir(self):
+        """Directory holding the profiles for this package, version, compiler
+        and configuration"""
+        key = "{0}-{1}-{2}-{3}".format(
+            self.name, self.spec.version, self.spec.compiler, self._pgo_config_hash()
+        )
+        return join_path(spack.paths.user_cache_path, "pgo", key.replace("@", "-"))
+
+    @property
+    def _clang_profdata(self):
+        return join_path(self.pgo_profile_dir, "default.profdata")
+
+    def pgo_args(self):
+        """CMake cache entries that add the PGO flags for the current stage"""
+        stage = self.spec.variants["pgo"].value
+        if stage == "none":
+            return []
+
+        profile_dir = self.pgo_profile_dir
+        if self.spec.satisfies("%clang"):
+            if stage == "generate":
+                flags = ["-fprofile-generate=" + profile_dir]
+            else:
+                flags = ["-fprofile-use=" + self._clang_profdata, "-Wno-profile-instr-unprofiled"]
+        else:
+            prefix_path = "-fprofile-prefix-path=" + self.build_directory
+            if stage == "generate":
+                flags = ["-fprofile-generate=" + profile_dir, "-fprofile-update=atomic"]
+            else:
+                flags = [
+                    "-fprofile-use=" + profile_dir,
+                    "-fprofile-partial-training",
+                    "-Wno-missing-profile",
+                    "-Wno-error=coverage-mismatch",
+                ]
+            flags.append(prefix_path)
+
+        flags = " ".join(flags)
+        return [
+            self.define("CMAKE_C_FLAGS", flags),
+            self.define("CMAKE_CXX_FLAGS", flags),
+            self.define("CMAKE_EXE_LINKER_FLAGS", flags),
+            self.define("CMAKE_SHARED_LINKER_FLAGS", flags),
+        ]
+
+    @run_before("cmake")
+    def _pgo_prepare(self):
+        stage = self.spec.variants["pgo"].value
+        profile_dir = self.pgo_profile_dir
+        if stage == "generate":
+            # Start from an empty directory so that profiles of earlier
+            # training runs aren't merged into the new ones
+            if os.path.isdir(profile_dir):
+                shutil.rmtree(profile_dir)
+            mkdirp(profile_dir)
+        elif stage == "use":
+            profiles = glob.glob(join_path(profile_dir, "**", "*.gcda"), recursive=True)
+            profiles += glob.glob(join_path(profile_dir, "*.profraw"))
+            if not profiles:
+                raise InstallError(
+                    "No profile data found in {0}".format(profile_dir),
+                    "Install {0} with pgo=generate and run the training first".format(self.name),
+                )
+            if self.spec.satisfies("%clang"):
+                llvm_profdata = Executable(
+                    join_path(os.path.dirname(self.compiler.cxx), "llvm-profdata")
+                )
+                llvm_profdata(
+                    "merge",
+                    "-o",
+                    self._clang_profdata,
+                    *glob.glob(join_path(profile_dir, "*.profraw"))
+                )
+
+
+class UnityBuildPackage(spack.package_base.PackageBase):
+    """Unity (jumbo) builds through CMAKE_UNITY_BUILD.
+
+    Recipes tune ``unity_build_batch_size`` and list the source directories
+    that can't be combined (e.g. C code relying on file-scope statics) in
+    ``unity_build_exclude``, relative to the top-level source directory.
+    """
+
+    variant(
+        "unity_build",
+        default=False,
+        description="Combine sources into unity (jumbo) translation units",
+    )
+
+    # cmake_language(DEFER) is used to apply unity_build_exclude
+    depends_on("cmake@3.19:", type="build", when="+unity_build")
+
+    unity_build_batch_size = 16
+    unity_build_exclude = []
+
+    def unity_build_args(self):
+        """CMake cache entries enabling the unity build"""
+        if "+unity_build" not in self.spec:
+            return []
+
+        args = [
+            self.define("CMAKE_UNITY_BUILD", True),
+            self.define("CMAKE_UNITY_BUILD_BATCH_SIZE", self.unity_build_batch_size),
+        ]
+        if self.unity_build_exclude:
+            args.extend(
+                [
+                    self.define(
+                        "CMAKE_PROJECT_INCLUDE",
+                        join_path(os.path.dirname(__file__), "unity_build_exclude.cmake"),
+                    ),
+                    self.define("PLATO_UNITY_BUILD_EXCLUDE", self.unity_build_exclude),
+                ]
+            )
+        return args
+
+
+class CompilerLauncherPackage(spack.package_base.PackageBase):
+    """Compiler caching through CMAKE_<LANG>_COMPILER_LAUNCHER.
+
+    Every package gets its own cache directory, under
+    ``$PLATO_COMPILER_CACHE_DIR`` if set and the Spack user cache otherwise.
+    Recipes call ``compiler_launcher_args`` from ``cmake_args`` and
+    ``setup_compiler_launcher_environment`` from ``setup_build_environment``.
+    """
+
+    variant(
+        "compiler_launcher",
+        default="none",
+        values=("none", "ccache", "sccache"),
+        multi=False,
+        description="Cache object files with ccache or sccache",
+    )
+
+    depends_on("ccache", type="build", when="compiler_launcher=ccache")
+    depends_on("sccache", type="build", when="compiler_launcher=sccache")
+
+    @property
+    def compiler_cache_dir(self):
+        root = os.environ.get(
+            "PLATO_COMPILER_CACHE_DIR", join_path(spack.paths.user_cache_path, "compiler-cache")
+        )
+        return join_path(root, self.name)
+
+    def _compiler_cache_key(self):
+        # The Spack compiler wrappers inject target and spec flags that the
+        # launcher never sees on the command line, and the real C++ compiler
+        # may be hidden behind kokkos-nvcc-wrapper (OMPI_CXX, MPICH_CXX...).
+        # Hash all of it so that a change invalidates the cached objects.
+        spec = self.spec
+        key = [str(spec.compiler), str(spec.target)]
+        key.extend("{0}={1}".format(k, " ".join(v)) for k, v in sorted(spec.compiler_flags.items()))
+        if "kokkos-nvcc-wrapper" in spec:
+            key.append(spec["kokkos-nvcc-wrapper"].dag_hash())
+            if "cuda" in spec:
+                key.append(str(spec["cuda"].version))
+        return hashlib.sha256(" ".join(key).encode("utf-8")).hexdigest()[:16]
+
+    def compiler_launcher_args(self):
+        """CMake cache entries setting the compiler launchers"""
+        launcher = self.spec.variants["compiler_launcher"].value
+        if launcher == "none":
+            return []
+
+        exe = join_path(self.spec[launcher].prefix.bin, launcher)
+        return [
+            self.define("CMAKE_{0}_COMPILER_LAUNCHER".format(lang), exe)
+            for lang in ("C", "CXX", "CUDA")
+        ]
+
+    def setup_compiler_launcher_environment(self, env):
+        launcher = self.spec.variants["compiler_launcher"].value
+        if launcher == "ccache":
+            env.set("CCACHE_DIR", self.compiler_cache_dir)
+            # Stage directories contain the spec hash; rewrite them to
+            # relative paths so rebuilds of a changed spec still hit
+            env.set("CCACHE_BASEDIR", spack.stage.get_stage_root())
+            env.set("CCACHE_NOHASHDIR", "1")
+            # Preprocessor mode sees the include paths the wrappers inject
+            env.set("CCACHE_NODIRECT", "1")
+            env.set("CCACHE_COMPILERCHECK", "string:" + self._compiler_cache_key())
+        elif launcher == "sccache":
+            env.set("SCCACHE_DIR", self.compiler_cache_dir)
+            env.set("SCCACHE_C_CUSTOM_CACHE_BUSTER", self._compiler_cache_key())
+
+
+def setup_parallel_io_environment(env):
+    """Make IOSS write a single composed Exodus file: every rank writes its
+    part collectively through parallel NetCDF-4/HDF5, with no epu join
+    afterwards. Properties the user already set are kept."""
+    for prop in ("COMPOSE_RESULTS=YES", "PARALLEL_IO_MODE=netcdf4"):
+        env.append_path("IOSS_PROPERTIES", prop, separator=":")
+
+
+def check_static_startup(pkg, exe, shared_libs, options=("--help",)):
+    """Check that ``exe`` doesn't load any of ``shared_libs`` and report how
+    long it takes to start. Used by the spack tests of ``+static`` builds."""
+    ldd = which("ldd", required=True)
+    loaded = ldd(exe, output=str, error=str)
+    for lib in shared_libs:
+        assert lib not in loaded, "{0} still loads {1} dynamically".format(exe, lib)
+
+    start = time.time()
+    pkg.run_test(exe, list(options), status=[0, 1], purpose="timing startup of " + exe)
+    print("{0} startup time: {1:.3f} s".format(os.path.basename(exe), time.time() - start))
+
+
+def check_loader_lookups(exe, options=("--help",), trace_only=False):
+    """Start ``exe`` without LD_LIBRARY_PATH and report how many files the
+    dynamic loader tried while resolving its libraries. The installed
+    RUNPATHs alone must be enough to find them. With ``trace_only`` the
+    loader only resolves the libraries (as ldd does) and ``exe`` never runs."""
+    env = dict(os.environ)
+    env.pop("LD_LIBRARY_PATH", None)
+    env["LD_DEBUG"] = "libs"
+    if trace_only:
+        env["LD_TRACE_LOADED_OBJECTS"] = "1"
+        options = ()
+    out = Executable(exe)(*options, env=env, output=str, error=str, fail_on_error=False)
+
+    assert "error while loading shared libraries" not in out, out
+    assert "=> not found" not in out, out
+    searches = out.count("find library=")
+    tries = out.count("trying file=")
+    print(
+        "{0}: {1} library searches, {2} files tried".format(os.path.basename(exe), searches, tries)
+    )
+    return tries
@@ -0,0 +1,38 @@
+# Included through CMAKE_PROJECT_INCLUDE by UnityBuildPackage. Once the
+# top-level directory has been processed, unity builds are turned off for
+# every target defined under one of the source directories listed in
+# PLATO_UNITY_BUILD_EXCLUDE (paths relative to the top-level source dir).
+
+include_guard(GLOBAL)
+
+function(_plato_unity_build_exclude dir excluded)
+  if(NOT excluded)
+    foreach(path IN LISTS PLATO_UNITY_BUILD_EXCLUDE)
+      string(FIND "${dir}/" "${CMAKE_SOURCE_DIR}/${path}/" pos)
+      if(pos EQUAL 0)
+        message(STATUS "Disabling unity build for ${path}")
+        set(excluded TRUE)
+      endif()
+    endforeach()
+  endif()
+
+  if(excluded)
+    get_property(targets DIRECTORY "${dir}" PROPERTY BUILDSYSTEM_TARGETS)
+    foreach(target IN LISTS targets)
+      get_property(type TARGET ${target} PROPERTY TYPE)
+      if(NOT type STREQUAL "INTERFACE_LIBRARY" AND NOT type STREQUAL "UTILITY")
+        set_property(TARGET ${target} PROPERTY UNITY_BUILD OFF)
+      endif()
+    endforeach()
+  endif()
+
+  get_property(subdirs DIRECTORY "${dir}" PROPERTY SUBDIRECTORIES)
+  foreach(subdir IN LISTS subdirs)
+    _plato_unity_build_exclude("${subdir}" ${excluded})
+  endforeach()
+endfunction()
+
+if(PLATO_UNITY_BUILD_EXCLUDE)
+  cmake_language(DEFER DIRECTORY "${CMAKE_SOURCE_DIR}"
+    CALL _plato_unity_build_exclude "${CMAKE_SOURCE_DIR}" FALSE)
+endif()
@@ -22,10 +22,25 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
-from spack import *
-
+import glob
+import json
+import os
+import re
+import time
 
-class Platoanalyze(CMakePackage, CudaPackage):
+from spack import *
+from spack.pkg.plato.plato_build_utils import (
+    CompilerLauncherPackage,
+    PgoPackage,
+    UnityBuildPackage,
+    check_loader_lookups,
+    check_static_startup,
+    setup_parallel_io_environment,
+)
+
+
+class Platoanalyze(CMakePackage, CudaPackage, CompilerLauncherPackage, PgoPackage,
+                   UnityBuildPackage):
     """Plato Analyze"""
 
     homepage = "https://github.com/platoengine/platoanalyze"
@@ -40,16 +55,25 @@ class Platoanalyze(CMakePackage, CudaPackage):
     variant( 'cuda',       default=True,     description='Compile with Nvidia CUDA'     )
     variant( 'amgx',       default=True,     description='Compile with AMGX'            )
     variant( 'meshmap',    default=True,     description='Compile with MeshMap'         )
+    variant( 'meshmap_kokkos', default=False, description='Run MeshMap queries on ArborX built against the Trilinos Kokkos' )
     variant( 'mpmd',       default=True,     description='Compile with mpmd'            )
-    variant( 'physics',    default=True,     description='Compile with all Physics'      )
-    variant( 'helmholtz',  default=True,     description='Compile with Helmholtz filter' )
+    variant( 'physics',    default='elliptic,parabolic,hyperbolic,stabilized,plasticity,helmholtz',
+             values=('elliptic', 'parabolic', 'hyperbolic', 'stabilized', 'plasticity',
+                     'helmholtz', 'hex_elements', 'micromorphic'),
+             multi=True,       description='Physics (residuals) to compile' )
     variant( 'unittests',  default=True,     description='Compile with unit tests' )
     variant( 'enginemesh', default=True,     description='Compile with enginemesh as default' )
     variant( 'omega-h',    default=False,    description='Compile with enginemesh as default' )
     variant( 'esp',        default=False,    description='Compile with ESP'             )
     variant( 'openmp',     default=False,    description='Compile with openmp'          )
+    variant( 'profiling',  default=False,    description='Enable Kokkos Tools kernel timings' )
     variant( 'python',     default=False,    description='Compile with python'          )
+    variant( 'static',     default=False,    description='Link static executables against a static Trilinos' )
+    variant( 'parallel_io', default=False,   description='Write composed Exodus output with collective parallel I/O' )
+    variant( 'adios2',     default=False,    description='Build Trilinos with the IOSS ADIOS2 database' )
+    variant( 'kokkoskernels_tpls', default=False, description='Use vendor sparse/dense kernels in KokkosKernels' )
     variant( 'tpetra',     default=False,    description='Compile with Tpetra'          )
+    variant( 'mixed_precision', default=False, description='Build Trilinos with the float MueLu/Ifpack2 instantiations for single-precision preconditioning' )
     variant( 'tacho',      default=False,    description='Compile with Tacho'           )
     variant( 'umfpack',    default=False,    description='Compile with UMFPACK'         )
     variant( 'epetra',     default=True,     description='Compile with Epetra'          )
@@ -58,18 +82,30 @@ class Platoanalyze(CMakePackage, CudaPackage):
     variant( 'dakota_tests', default=False, description='Compile with Dakota integration tests')
     variant( 'verificationtests', default=True, description='Compile with verification tests' )
     variant( 'verificationdoc', default=False,  description='Compile with VerificationDoc target' )
-    variant( 'hex_elements', default=False, description='Compile with hex elements' ) 
-    variant( 'micromorphic', default=False, description='Compile with micromorphic physics' ) 
     variant( 'all_penalty', default=False, description='Compile with all penalization schemes, including RAMP and Heaviside' )
+    variant( 'benchmarks', default=False, description='Install timed benchmark problems run by spack test' )
 
     depends_on('trilinos@15.0.0+kokkos+kokkoskernels+exodus gotype=int cxxstd=17')
     depends_on('trilinos+cuda+wrapper', when='+cuda')
-    depends_on('trilinos+openmp', when='+openmp')
+    depends_on('trilinos+openmp blas_threads=openmp', when='+openmp')
     depends_on('trilinos+tacho', when='+tacho')
+    depends_on('trilinos+profiling', when='+profiling')
+    depends_on('trilinos+kokkoskernels_tpls', when='+kokkoskernels_tpls')
+    depends_on('trilinos~shared', when='+static')
+    depends_on('platoengine+static', when='+static+mpmd')
+    depends_on('trilinos+exodus+hdf5+mpi', when='+parallel_io')
+    depends_on('netcdf-c+mpi+parallel-netcdf', when='+parallel_io')
+    depends_on('hdf5+mpi', when='+parallel_io')
+    depends_on('trilinos+adios2+exodus+mpi', when='+adios2')
+    depends_on('adios2+mpi', when='+adios2')
     depends_on('suite-sparse', when='+umfpack')
     depends_on('trilinos+tpetra+belos+ifpack2+amesos2+muelu+zoltan2',             when='+tpetra')
     depends_on('trilinos~tpetra~amesos2~ifpack2~belos~muelu~zoltan2',             when='~tpetra')
     depends_on('trilinos~epetra',                                                 when='~epetra')
+    depends_on('trilinos+float+tpetra+belos+ifpack2+muelu',                       when='+mixed_precision')
+
+    depends_on('trilinos pgo=generate', when='pgo=generate')
+    depends_on('trilinos pgo=use',      when='pgo=use')
 
     depends_on('kokkos-nvcc-wrapper@4.0.01', when='+cuda')
 
@@ -77,11 +113,16 @@ class Platoanalyze(CMakePackage, CudaPackage):
     depends_on('platoengine+dakota',                                              when='+dakota_tests')
 
     depends_on('cmake@3.0.0:', type='build')
+    depends_on('cmake@3.14:',  type='build', when='+benchmarks')  # ctest --show-only=json-v1
     depends_on('python @3.8:',                               when='+python')
     depends_on('platoengine+expy',                           when='+python')
     depends_on('platoengine+expy',                           when='+verificationtests')
 
-    depends_on('arborx~mpi~cuda~serial @v1.1',              when='+meshmap')
+    depends_on('arborx~mpi~cuda~serial @v1.1',              when='+meshmap~meshmap_kokkos')
+    # Kokkos-backed ArborX; 1.4 is the first release supporting Kokkos 4
+    depends_on('arborx+trilinos+serial~mpi @v1.4',          when='+meshmap+meshmap_kokkos')
+    depends_on('arborx+openmp',                             when='+meshmap+meshmap_kokkos+openmp')
+    depends_on('arborx+cuda',                               when='+meshmap+meshmap_kokkos+cuda')
     depends_on('amgx@2.2',                                  when='+amgx')
     depends_on('esp@BetaLin-2023-11-09', type=('build', 'link', 'run'),        when='+esp')
     depends_on('platoengine+esp',                           when='+esp')
@@ -98,21 +139,36 @@ class Platoanalyze(CMakePackage, CudaPackage):
 
     conflicts('+enginemesh', when='~mpmd')
     conflicts('+meshmap',  when='~mpmd')
+    conflicts('+meshmap_kokkos', when='~meshmap')
     conflicts('+amgx',     when='~cuda')
-    conflicts('+openmp',   when='+cuda')
     depends_on('omega-h@develop_bb6b', type=('build', 'link', 'run'), when='+omega-h')
     depends_on('omega-h+cuda',                              when='+cuda+omega-h')
 
     conflicts('~epetra',    when='~tpetra')
+    conflicts('+mixed_precision', when='~tpetra')
     conflicts('~omega-h',   when='~enginemesh')
     conflicts('+omega-h',   when='+enginemesh')
-    conflicts('+unittests', when='~physics')
+    # the unit tests instantiate every residual except the optional ones
+    for _physics in ('elliptic', 'parabolic', 'hyperbolic', 'stabilized', 'plasticity'):
+        requires('physics=' + _physics, when='+unittests',
+                 msg='+unittests needs physics={0}'.format(_physics))
+    # Python modules (the Analyze bindings and the platoengine+expy module used
+    # by the verification tests) can't link a non-PIC static Trilinos
+    conflicts('+static',    when='+python')
+    conflicts('+static',    when='+verificationtests')
+    # the benchmark problems are taken from the integration tests
+    conflicts('+benchmarks', when='~integration_tests')
+    # the pgo=generate training runs are the integration and verification tests
+    conflicts('pgo=generate', when='~integration_tests~verificationtests')
 
     def cmake_args(self):
         spec = self.spec
         options = []
 
-        options.extend([ '-DBUILD_SHARED_LIBS:BOOL=ON' ])
+        if '+static' in spec:
+          options.extend([ '-DBUILD_SHARED_LIBS:BOOL=OFF' ])
+        else:
+          options.extend([ '-DBUILD_SHARED_LIBS:BOOL=ON' ])
 
         trilinos_dir = spec['trilinos'].prefix
         options.extend([ '-DTrilinos_PREFIX:PATH={0}'.format(trilinos_dir) ])
@@ -172,18 +228,10 @@ class Platoanalyze(CMakePackage, CudaPackage):
           options.extend([ '-DAMGX_PREFIX:PATH={0}'.format(amgx_dir) ])
           options.extend([ '-DPLATOANALYZE_ENABLE_AMGX=ON' ])
           
-        if '~physics' in spec:
-          options.extend([ '-DELLIPTIC=OFF' ])
-          options.extend([ '-DPARABOLIC=OFF' ])
-          options.extend([ '-DHYPERBOLIC=OFF' ])
-          options.extend([ '-DSTABILIZED=OFF' ])
-          options.extend([ '-DPLASTICITY=OFF' ])
-
-        if '+helmholtz' in spec:
-          options.extend([ '-DHELMHOLTZ=ON' ])
-
-        if '~helmholtz' in spec:
-          options.extend([ '-DHELMHOLTZ=OFF' ])
+        physics = spec.variants['physics'].value
+        for name in ('elliptic', 'parabolic', 'hyperbolic', 'stabilized', 'plasticity',
+                     'helmholtz', 'hex_elements', 'micromorphic'):
+          options.extend([ '-D{0}={1}'.format(name.upper(), 'ON' if name in physics else 'OFF') ])
 
         if '~unittests' in spec:
           options.extend([ '-DPLATOANALYZE_UNIT_TEST=OFF' ])
@@ -211,22 +259,129 @@ class Platoanalyze(CMakePackage, CudaPackage):
         elif '~verificationtests' in spec:
           options.extend(['-DPLATOANALYZE_SMOKE_TESTS=OFF'])
 
-        if '+hex_elements' in spec:
-            options.extend(['-DHEX_ELEMENTS=ON'])
-        else:
-            options.extend(['-DHEX_ELEMENTS=OFF'])
-
-        if '+micromorphic' in spec:
-            options.extend(['-DMICROMORPHIC=ON'])
-        else:
-            options.extend(['-DMICROMORPHIC=OFF'])
-
         if '+all_penalty' in spec:
             options.extend(['-DALL_PENALTY=ON'])
 
+        options.extend(self.compiler_launcher_args())
+        options.extend(self.pgo_args())
+        options.extend(self.unity_build_args())
+
         return options
 
+    @run_after('build')
+    def pgo_train(self):
+        # Representative Plato problems for the instrumented build; failing
+        # tests still produce useful profiles so they don't stop the install
+        if not self.spec.satisfies('pgo=generate'):
+            return
+        with working_dir(self.build_directory):
+            ctest('--output-on-failure', fail_on_error=False)
+
+    # Benchmark families and the integration tests they are taken from, as
+    # (include, exclude) ctest regexes that select disjoint sets of tests.
+    # Each family covers the meshes its tests come with.
+    benchmark_tests = {
+        'elliptic':  ('[Ee]lastic|[Cc]ompliance', '[Tt]herm|[Hh]elmholtz'),
+        'helmholtz': ('[Hh]elmholtz', None),
+        'thermal':   ('[Tt]herm', '[Hh]elmholtz'),
+    }
+
+    @property
+    def benchmarks_dir(self):
+        return join_path(self.prefix.share, 'platoanalyze', 'benchmarks')
+
+    @run_after('install')
+    def install_benchmarks(self):
+        # Keep the input decks and command lines of the selected tests so
+        # spack test can rerun them against the installed executables
+        if '+benchmarks' not in self.spec:
+            return
+        benchmarks = []
+        installed_dirs = set()
+        with working_dir(self.build_directory):
+            for family, (regex, exclude) in sorted(self.benchmark_tests.items()):
+                args = ['--show-only=json-v1', '-R', regex] + (['-E', exclude] if exclude else [])
+                tests = json.loads(ctest(*args, output=str))['tests']
+                for test in tests:
+                    props = dict((p['name'], p['value']) for p in test.get('properties', []))
+                    workdir = props.get('WORKING_DIRECTORY')
+                    # Tests without their own directory in the stage have no
+                    # inputs to keep
+                    if 'command' not in test or not workdir:
+                        continue
+                    directory = os.path.relpath(workdir, self.stage.path)
+                    if directory.startswith(os.pardir):
+                        continue
+                    if directory not in installed_dirs:
+                        install_tree(workdir, join_path(self.benchmarks_dir, directory))
+                        installed_dirs.add(directory)
+                    command = [self._installed_arg(arg, workdir) for arg in test['command']]
+                    for arg in command:
+                        if self.stage.path in arg:
+                            raise InstallError(
+                                'Benchmark {0} refers to the build stage: {1}'.format(test['name'], arg))
+                    benchmarks.append({
+                        'name': join_path(family, test['name']),
+                        'directory': directory,
+                        'command': command,
+                    })
+        with open(join_path(self.benchmarks_dir, 'benchmarks.json'), 'w') as f:
+            json.dump(benchmarks, f, indent=2)
+
+    def _installed_arg(self, arg, workdir):
+        # Build-tree executables map to the installed ones, files from the
+        # test directory (also inside -D...= arguments) to the copy the
+        # command runs in
+        if arg.startswith(self.build_directory) and not arg.startswith(workdir + os.sep):
+            installed = join_path(self.prefix.bin, os.path.basename(arg))
+            if os.path.exists(installed):
+                return installed
+        return re.sub(re.escape(workdir) + r'(?=/|;|$)', '.', arg)
+
+    def _run_benchmark(self, benchmark):
+        work_dir = join_path(self.test_suite.current_test_cache_dir, benchmark['name'])
+        install_tree(join_path(self.benchmarks_dir, benchmark['directory']), work_dir)
+        exe = Executable(benchmark['command'][0])
+        with working_dir(work_dir):
+            start = time.time()
+            out = exe(*benchmark['command'][1:], output=str, error=str)
+            wall = time.time() - start
+
+        # Plato Engine writes one diagnostics row per optimization iteration
+        iterations = 0
+        for diagnostics in glob.glob(join_path(work_dir, 'plato_*_diagnostics.txt')):
+            with open(diagnostics) as f:
+                iterations = max(iterations, sum(1 for l in f if re.match(r'\s*\d+\s', l)))
+
+        print('{0}: {1:.2f} s wall, {2} iterations'.format(benchmark['name'], wall, iterations))
+        if iterations:
+            print('  {0:.3f} s per iteration'.format(wall / iterations))
+        # Teuchos::TimeMonitor summary lines for the solve and assembly timers
+        for line in out.splitlines():
+            if re.search(r'[Ss]olve|[Aa]ssembl', line) and re.search(r'\d+\.\d+', line):
+                print('  ' + ' '.join(line.split()))
+
+    def setup_build_environment(self, env):
+        self.setup_compiler_launcher_environment(env)
+
     def setup_run_environment(self, run_env):
-        run_env.prepend_path('LD_LIBRARY_PATH', self.spec['platoanalyze'].prefix.lib)
         if '+python' in self.spec:
           run_env.prepend_path('PYTHONPATH', self.prefix.lib)
+        if '+parallel_io' in self.spec:
+          setup_parallel_io_environment(run_env)
+
+    # Trilinos, Kokkos and SEACAS libraries that a +static build must not load
+    static_libs = ['libteuchos', 'libkokkos', 'libtpetra', 'libepetra', 'libexodus', 'libioss']
+
+    def test(self):
+        exe = join_path(self.prefix.bin, 'analyze_MPMD' if '+mpmd' in self.spec else 'analyze')
+        check_loader_lookups(exe)
+
+        if '+static' in self.spec:
+          check_static_startup(self, exe, self.static_libs)
+
+        if '+benchmarks' in self.spec:
+          with open(join_path(self.benchmarks_dir, 'benchmarks.json')) as f:
+            benchmarks = json.load(f)
+          for benchmark in benchmarks:
+            self._run_benchmark(benchmark)
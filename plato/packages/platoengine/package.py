@@ -4,9 +4,16 @@
 # SPDX-License-Identifier: (Apache-2.0 OR MIT)
 
 from spack import *
+from spack.pkg.plato.plato_build_utils import (
+    CompilerLauncherPackage,
+    UnityBuildPackage,
+    check_loader_lookups,
+    check_static_startup,
+    setup_parallel_io_environment,
+)
 
 
-class Platoengine(CMakePackage, CudaPackage):
+class Platoengine(CMakePackage, CudaPackage, CompilerLauncherPackage, UnityBuildPackage):
     """Plato Engine - Platform for Topology Optimization"""
     
     homepage = "https://www.sandia.gov/plato3d/"
@@ -33,8 +40,12 @@ class Platoengine(CMakePackage, CudaPackage):
     variant( 'tpetra_tests',   default=False,   description='Configure Tpetra tests'          )
     variant( 'dakota',         default=False,   description='Compile with Dakota'             )
     variant( 'services',       default=False,   description='Compile with services'           )
+    variant( 'static',         default=False,   description='Link static executables against a static Trilinos')
+    variant( 'parallel_io',    default=False,   description='Write composed Exodus output with collective parallel I/O')
+    variant( 'adios2',         default=False,   description='Build Trilinos with the IOSS ADIOS2 database')
     variant( 'sierra_tests',   default=False,   description='Enable sierra testing'           )
     variant( 'optimism',       default=False,   description='Enable OptimiSM and its Plato utilities')
+    variant( 'profiling',      default=False,   description='Enable Kokkos Tools kernel timings')
 
     conflicts( '+expy', when='-platomain')
     conflicts( '+iso',  when='-stk')
@@ -48,6 +59,7 @@ class Platoengine(CMakePackage, CudaPackage):
     conflicts( '+expy', when='+dakota')
     conflicts( '~services', when='+dakota')
     conflicts( '+optimism', when='~python_app')
+    conflicts( '+static', when='+expy')
 
     depends_on( 'mpi',            type=('build','link','run'))
     depends_on( 'cmake@3.0.0:',   type='build')
@@ -57,6 +69,13 @@ class Platoengine(CMakePackage, CudaPackage):
     depends_on( 'trilinos+percept+zoltan+boost+stk', when='+prune')
     depends_on( 'trilinos+cuda+wrapper', when='+cuda')
     depends_on( 'trilinos~cuda', when='+dakota')
+    depends_on( 'trilinos+kokkos+profiling', when='+profiling')
+    depends_on( 'trilinos~shared', when='+static')
+    depends_on( 'trilinos+exodus+hdf5+mpi', when='+parallel_io')
+    depends_on( 'netcdf-c+mpi+parallel-netcdf', when='+parallel_io')
+    depends_on( 'hdf5+mpi', when='+parallel_io')
+    depends_on( 'trilinos+adios2+exodus+mpi', when='+adios2')
+    depends_on( 'adios2+mpi', when='+adios2')
 
     depends_on( 'googletest',                                      when='+unit_testing' )
     depends_on( 'python@3.8:',    type=('build', 'link', 'run'), when='+expy'    )
@@ -88,6 +107,9 @@ class Platoengine(CMakePackage, CudaPackage):
         trilinos_dir = spec['trilinos'].prefix
         options.extend([ '-DTRILINOS_INSTALL_DIR:FILEPATH={0}'.format(trilinos_dir) ])
 
+        if '+static' in spec:
+          options.extend([ '-DBUILD_SHARED_LIBS:BOOL=OFF' ])
+
         if spec.satisfies('+cuda'):
           options.extend(['-DPLATOENGINE_ENABLE_CUDA=ON'])
         else:
@@ -159,16 +181,31 @@ class Platoengine(CMakePackage, CudaPackage):
         if '+optimism' in spec:
           options.extend([ '-DOPTIMISM_TESTS_ENABLED=ON' ])
 
+        options.extend(self.compiler_launcher_args())
+        options.extend(self.unity_build_args())
+
         return options
 
 
-    def setup_run_environment(self, run_env):
-        run_env.prepend_path('LD_LIBRARY_PATH', self.spec['platoengine'].prefix.lib)
+    def setup_build_environment(self, env):
+        self.setup_compiler_launcher_environment(env)
 
+    def setup_run_environment(self, run_env):
         if '+expy' in self.spec:
           run_env.prepend_path('PYTHONPATH', self.prefix.lib)
           run_env.prepend_path('PYTHONPATH', self.prefix.etc)
 
-        run_env.prepend_path('LD_LIBRARY_PATH', self.spec['mpi'].prefix.lib)
+        if '+parallel_io' in self.spec:
+          setup_parallel_io_environment(run_env)
 
         run_env.prepend_path('PATH', self.prefix.etc)
+
+    # Trilinos, Kokkos and SEACAS libraries that a +static build must not load
+    static_libs = ['libteuchos', 'libkokkos', 'libepetra', 'libexodus', 'libioss']
+
+    def test(self):
+        if '+platomain' in self.spec:
+          check_loader_lookups(join_path(self.prefix.bin, 'PlatoMain'))
+
+        if '+static' in self.spec and '+platomain' in self.spec:
+          check_static_startup(self, join_path(self.prefix.bin, 'PlatoMain'), self.static_libs)
@@ -32,8 +32,9 @@ class PyOptimism(Package):
         build_env.prepend_path('PYTHONPATH', self.spec['py-pip'].prefix.lib)
         build_env.set("SUITESPARSE_INCLUDE_DIR", self.spec['suite-sparse'].prefix.include)
         build_env.set("SUITESPARSE_LIBRARY_DIR", self.spec['suite-sparse'].prefix.lib)
+        # Record suite-sparse in the RUNPATH of the compiled extensions
+        build_env.append_flags("LDFLAGS", "-Wl,--enable-new-dtags,-rpath," + self.spec['suite-sparse'].prefix.lib)
 
     def setup_run_environment(self, run_env):
         run_env.prepend_path('PYTHONPATH', self.prefix)
         run_env.prepend_path('PYTHONPATH', self.prefix.lib)
-        run_env.prepend_path('LD_LIBRARY_PATH', self.spec['suite-sparse'].prefix.lib)
@@ -0,0 +1,44 @@
+#!/bin/bash
+# Usage: trilinos-omp-launch <program> [args...]
+#
+# Runs <program> with OpenMP threads bound to the cores available to this
+# MPI rank. The thread count is the number of cores hwloc reports divided by
+# the number of ranks on the node. Variables already set are left untouched.
+
+# SLURM_TASKS_PER_NODE is always set in a job step and looks like
+# "4(x2),3": pick the entry of this node (SLURM_NODEID)
+slurm_ranks() {
+  local node=${SLURM_NODEID:-0} entry count reps
+  for entry in ${SLURM_TASKS_PER_NODE//,/ }; do
+    count=${entry%%(*}
+    reps=1
+    if [[ $entry == *"(x"* ]]; then
+      reps=${entry#*(x}
+      reps=${reps%)}
+    fi
+    if (( node < reps )); then
+      echo "$count"
+      return
+    fi
+    node=$(( node - reps ))
+  done
+  echo 1
+}
+
+if [[ -n $OMPI_COMM_WORLD_LOCAL_SIZE || -n $MPI_LOCALNRANKS || -z $SLURM_TASKS_PER_NODE ]]; then
+  ranks=${OMPI_COMM_WORLD_LOCAL_SIZE:-${MPI_LOCALNRANKS:-1}}
+else
+  ranks=$(slurm_ranks)
+fi
+cores=$(@HWLOC_CALC@ --number-of core all 2>/dev/null || echo 1)
+threads=$(( cores / ranks ))
+if (( threads < 1 )); then
+  threads=1
+fi
+
+export OMP_NUM_THREADS=${OMP_NUM_THREADS:-$threads}
+export KOKKOS_NUM_THREADS=${KOKKOS_NUM_THREADS:-$OMP_NUM_THREADS}
+export OMP_PROC_BIND=${OMP_PROC_BIND:-spread}
+export OMP_PLACES=${OMP_PLACES:-cores}
+
+exec "$@"
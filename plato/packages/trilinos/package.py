@@ -11,6 +11,11 @@ from spack.error import NoHeadersError
 from spack.operating_systems.mac_os import macos_version
 from spack.package import *
 from spack.pkg.builtin.kokkos import Kokkos
+from spack.pkg.plato.plato_build_utils import (
+    CompilerLauncherPackage,
+    PgoPackage,
+    UnityBuildPackage,
+)
 
 # Trilinos is complicated to build, as an inspiration a couple of links to
 # other repositories which build it:
@@ -22,7 +27,14 @@ from spack.pkg.builtin.kokkos import Kokkos
 # https://github.com/trilinos/Trilinos/issues/175
 
 
-class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
+class Trilinos(
+    CMakePackage,
+    CudaPackage,
+    ROCmPackage,
+    CompilerLauncherPackage,
+    PgoPackage,
+    UnityBuildPackage,
+):
     """The Trilinos Project is an effort to develop algorithms and enabling
     technologies within an object-oriented software framework for the solution
     of large-scale, complex multi-physics engineering and scientific problems.
@@ -37,6 +49,11 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
 
     tags = ["e4s"]
 
+    # Heavily templated translation units: keep unity batches small.
+    # SEACAS and Zoltan are C code with colliding file-scope statics.
+    unity_build_batch_size = 8
+    unity_build_exclude = ["packages/seacas", "packages/zoltan"]
+
     # ###################### Versions ##########################
 
     version("master", branch="master")
@@ -73,6 +90,12 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
     # Build options
     variant("complex", default=False, description="Enable complex numbers in Trilinos")
     variant("cuda_rdc", default=False, description="Turn on RDC for CUDA build")
+    variant(
+        "cuda_launch_blocking",
+        default=False,
+        when="+cuda",
+        description="Export CUDA_LAUNCH_BLOCKING=1 for Trilinos and its dependents",
+    )
     variant("rocm_rdc", default=False, description="Turn on RDC for ROCm build")
     variant(
         "cxxstd", default="14", description="C++ standard", values=["11", "14", "17"], multi=False
@@ -87,6 +110,9 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
         "float", default=False, description="Enable single precision (float) numbers in Trilinos"
     )
     variant("fortran", default=True, description="Compile with Fortran support")
+    variant(
+        "ipo", default=False, description="Enable interprocedural (link-time) optimization"
+    )
     variant(
         "gotype",
         default="long_long",
@@ -95,8 +121,21 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
         description="global ordinal type for Tpetra",
     )
     variant("openmp", default=False, description="Enable OpenMP")
+    variant("profiling", default=False, description="Enable Kokkos Tools profiling hooks")
+    variant(
+        "profile",
+        default="full",
+        values=("full", "plato"),
+        multi=False,
+        description="Package and ETI profile; plato builds only what Plato uses",
+    )
     variant("python", default=False, description="Build PyTrilinos wrappers")
     variant("shared", default=True, description="Enables the build of shared libraries")
+    variant(
+        "simd",
+        default=False,
+        description="Enable Kokkos aggressive vectorization for the target microarchitecture",
+    )
     variant("uvm", default=False, when="@13.2: +cuda", description="Turn on UVM for CUDA build")
     variant("wrapper", default=False, description="Use nvcc-wrapper for CUDA build")
 
@@ -156,9 +195,13 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
 
     # Variants needed for Plato
     variant('kokkoskernels', default=True, description='Compile with KokkosKernels') # Added by Plato
+    variant('blas_threads', default='none', values=('none', 'openmp', 'pthreads'), multi=False, description='Threading of the BLAS/LAPACK provider') # Added by Plato
+    variant('external_kokkoskernels', default=False, when='@14.4.0: +kokkos +kokkoskernels', description='Use the spack kokkos and kokkos-kernels packages instead of the bundled ones') # Added by Plato
+    variant('kokkoskernels_tpls', default=False, description='Use vendor BLAS/LAPACK/MKL and cuBLAS/cuSPARSE kernels in KokkosKernels') # Added by Plato
     variant('pamgen', default=False, description='Compile with Pamgen') # Added by Plato
     variant("pardiso", default=False, description="Compile with support for pardiso-mkl solver") # Added by Plato
     variant('percept', default=False, description='Compile with percept') # Added by Plato
+    variant('external_seacas', default=False, when='@14: +exodus', description='Use the spack seacas package instead of the SEACAS inside Trilinos') # Added by Plato
     variant('tacho', default=False, description='Compile with Tacho') # Added by Plato
     variant('teuchos', default=True, description='Compile with Teuchos') # Added by Plato
 
@@ -257,6 +300,8 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
         conflicts("+intrepid2")
         conflicts("+phalanx")
         conflicts('+kokkoskernels') # Added by Plato
+        conflicts("+profiling")
+        conflicts("+simd")
 
     with when("~tpetra"):
         conflicts("+amesos2")
@@ -372,6 +417,13 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
     # Cuda UVM must be enabled prior to 13.2
     # See https://github.com/spack/spack/issues/28869
     conflicts("~uvm", when="@:13.1 +cuda")
+    # Before the external Kokkos 4 (14.4) Trilinos doesn't perform the memory
+    # fence itself and relies on blocking CUDA kernel launches
+    conflicts(
+        "~cuda_launch_blocking",
+        when="@:14.3 +cuda",
+        msg="Trilinos before 14.4 requires blocking CUDA kernel launches",
+    )
 
     # stokhos fails on xl/xl_r
     conflicts("+stokhos", when="%xl")
@@ -382,6 +434,27 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
     conflicts('+percept', when='~stk') # Added by Plato
     conflicts('+percept', when='~zoltan') # Added by Plato
     conflicts('+pamgen', when='%xl') # Added by Plato
+    conflicts('+kokkoskernels_tpls', when='~kokkoskernels') # Added by Plato
+    conflicts('blas_threads=pthreads', when='^intel-mkl') # Added by Plato
+    conflicts('blas_threads=pthreads', when='^intel-oneapi-mkl') # Added by Plato
+    # A pre-installed SEACAS makes TriBITS treat its upstream packages as
+    # pre-installed too, and Ioss/Nemslice sit on top of Zoltan (added by Plato)
+    conflicts('+zoltan', when='+external_seacas', msg='Zoltan would have to come from an external SEACAS as well')
+    # Generic targets have no Kokkos_ARCH_* (Kokkos.get_microarch returns
+    # nothing), so +simd would have no effect
+    for _target in ("x86_64", "x86_64_v2", "x86_64_v3", "x86_64_v4", "aarch64", "ppc64le"):
+        conflicts(
+            "+simd",
+            when="target=" + _target,
+            msg="+simd needs a specific microarchitecture target, e.g. target=skylake_avx512",
+        )
+    # Plato Analyze and Plato Engine only use double with int global ordinals
+    conflicts("+complex", when="profile=plato")
+    conflicts("gotype=long", when="profile=plato")
+    conflicts("gotype=long_long", when="profile=plato")
+    conflicts("gotype=all", when="profile=plato")
+    # Intel segfaults on STK with IPO, see the -no-ipo workaround in flag_handler
+    conflicts("+ipo", when="+stk %intel", msg="STK cannot be built with IPO by the Intel compiler")
 
     # ###################### Dependencies ##########################
 
@@ -389,16 +462,35 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
     depends_on("kokkos@4.1.00", when="@14.4.0: +kokkos")
     depends_on("kokkos +wrapper", when="trilinos@14.4.0: +kokkos +wrapper")
     depends_on("kokkos ~wrapper", when="trilinos@14.4.0: +kokkos ~wrapper")
+    depends_on("kokkos ~shared", when="trilinos@14.4.0: +kokkos ~shared")
+    depends_on("kokkos +aggressive_vectorization", when="trilinos@14.4.0: +kokkos +simd")
+    # Host execution space of the external Kokkos, also next to CUDA (added by Plato)
+    depends_on("kokkos +openmp", when="trilinos@14.4.0: +kokkos +openmp")
+
+    # External KokkosKernels, built once against the external Kokkos (added by Plato).
+    # 15.0.0 bundles Kokkos and KokkosKernels 4.1.00 and uses the external
+    # Kokkos only together with the external KokkosKernels
+    with when("+external_kokkoskernels"):
+        depends_on("kokkos-kernels@4.1.00")
+        depends_on("kokkos +cuda_lambda", when="+cuda")
+        depends_on("kokkos +cuda_uvm", when="+uvm")
+        depends_on("kokkos +cuda_relocatable_device_code", when="+cuda_rdc")
+        depends_on("kokkos-kernels+blas+lapack", when="+kokkoskernels_tpls")
+        depends_on("kokkos-kernels+cublas+cusparse", when="+kokkoskernels_tpls +cuda")
+        depends_on("kokkos-kernels+mkl", when="+kokkoskernels_tpls ^intel-mkl")
+        depends_on("kokkos-kernels+mkl", when="+kokkoskernels_tpls ^intel-oneapi-mkl")
 
     for a in CudaPackage.cuda_arch_values:
         arch_str = "+cuda cuda_arch=" + a
         kokkos_spec = "kokkos@4.1.00 " + arch_str
         depends_on(kokkos_spec, when="@14.4.0 +kokkos " + arch_str)
+        depends_on(kokkos_spec, when="+external_kokkoskernels " + arch_str) # Added by Plato
 
     for a in ROCmPackage.amdgpu_targets:
         arch_str = "+rocm amdgpu_target={0}".format(a)
         kokkos_spec = "kokkos@4.1.00 {0}".format(arch_str)
         depends_on(kokkos_spec, when="@14.4.0 +kokkos {0}".format(arch_str))
+        depends_on(kokkos_spec, when="+external_kokkoskernels {0}".format(arch_str)) # Added by Plato
 
     depends_on("adios2", when="+adios2")
     depends_on("blas")
@@ -412,6 +504,7 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
     depends_on("hdf5+hl", when="+hdf5")
     depends_on("hypre~internal-superlu~int64", when="+hypre")
     depends_on("kokkos-nvcc-wrapper", when="+wrapper")
+    depends_on("kokkos-tools", when="+profiling")
     depends_on("lapack")
     # depends_on('perl', type=('build',)) # TriBITS finds but doesn't use...
     depends_on("libx11", when="+x11")
@@ -464,7 +557,23 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
 
     # Dependencies added by Plato
     depends_on('metis', when='+tacho') # Added by Plato
+    # Added by Plato: the external SEACAS is the release closest to the 15.0.0
+    # snapshot. seacas_zoltan.patch fixes nem_slice built without Zoltan; a
+    # SEACAS with Zoltan doesn't need it, so the patch isn't carried over
+    depends_on(
+        "seacas@2023-10-24 +zoltan",
+        when="@15.0.0 +external_seacas",
+        type=("build", "link", "run"),
+    )
+    depends_on("seacas", when="+external_seacas", type=("build", "link", "run")) # Added by Plato
+    depends_on("seacas+mpi", when="+external_seacas +mpi") # Added by Plato
+    depends_on("seacas~mpi", when="+external_seacas ~mpi") # Added by Plato
     depends_on("intel-mkl", when="+pardiso") # Added by Plato
+    for _threads in ("none", "openmp", "pthreads"): # Added by Plato
+        depends_on("openblas threads=" + _threads, when="blas_threads=" + _threads + " ^openblas")
+    for _threads in ("none", "openmp"): # Added by Plato
+        depends_on("intel-mkl threads=" + _threads, when="blas_threads=" + _threads + " ^intel-mkl")
+        depends_on("intel-oneapi-mkl threads=" + _threads, when="blas_threads=" + _threads + " ^intel-oneapi-mkl")
 
     # ###################### Patches ##########################
 
@@ -510,6 +619,10 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
         elif name == "ldflags":
             if spec.satisfies("%cce@:14"):
                 flags.append("-fuse-ld=gold")
+            if spec.satisfies("+ipo %gcc@10:"):
+                # CMake's IPO flags for GCC (-flto) link-time optimize with a
+                # single job; -flto=auto runs the LTO backend on all cores
+                flags.append("-flto=auto")
             if spec.satisfies("platform=linux ~cuda"):
                 # TriBITS explicitly links libraries against all transitive
                 # dependencies, leading to O(N^2) library resolution. When
@@ -542,12 +655,40 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
         return url.format(version.dashed)
 
     def setup_dependent_run_environment(self, env, dependent_spec):
-        if "+cuda" in self.spec:
-            # currently Trilinos doesn't perform the memory fence so
-            # it relies on blocking CUDA kernel launch. This is needed
-            # in case the dependent app also run a CUDA backend via Trilinos
+        if self.spec.satisfies("+cuda +cuda_launch_blocking"):
+            # This is needed in case the dependent app also runs a CUDA
+            # backend via Trilinos
             env.set("CUDA_LAUNCH_BLOCKING", "1")
 
+        if "+profiling" in self.spec:
+            self._setup_kokkos_tools_environment(env)
+
+        self._setup_blas_threads_environment(env)
+
+    def _setup_blas_threads_environment(self, env):
+        # Added by Plato: keep BLAS threads from competing with Kokkos threads
+        blas_threads = self.spec.variants["blas_threads"].value
+        if blas_threads == "none":
+            env.set("OPENBLAS_NUM_THREADS", "1")
+            env.set("MKL_NUM_THREADS", "1")
+        elif blas_threads == "openmp":
+            # BLAS shares the OpenMP runtime with Kokkos: calls made from
+            # inside Kokkos parallel regions stay single-threaded
+            env.set("OMP_MAX_ACTIVE_LEVELS", "1")
+        elif "+openmp" in self.spec:
+            # pthreads BLAS next to Kokkos OpenMP threads oversubscribes
+            env.set("OPENBLAS_NUM_THREADS", "1")
+
+    def _setup_kokkos_tools_environment(self, env):
+        # The kernel timer reports the time spent in every named
+        # parallel_for/reduce/scan region; read its output with kp_reader.
+        # kokkos-tools installs into lib or lib64 depending on the platform
+        kernel_timer = find_libraries(
+            "libkp_kernel_timer", root=self.spec["kokkos-tools"].prefix, recursive=True
+        )
+        if kernel_timer:
+            env.set("KOKKOS_TOOLS_LIBS", kernel_timer[0])
+
     def setup_dependent_package(self, module, dependent_spec):
         if "+wrapper" in self.spec:
             self.spec.kokkos_cxx = self.spec["kokkos-nvcc-wrapper"].kokkos_cxx
@@ -575,6 +716,10 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
                 # Using CXXFLAGS for hipcc which doesn't use flags in the spack wrappers
                 env.set("CXXFLAGS", "-DSTK_NO_BOOST_STACKTRACE")
 
+        # The launcher wraps the MPI compiler wrappers, so it also covers
+        # kokkos-nvcc-wrapper selected through OMPI_CXX/MPICH_CXX above
+        self.setup_compiler_launcher_environment(env)
+
     def cmake_args(self):
         options = []
 
@@ -600,6 +745,8 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
         # Same but for TPLs
         define_tpl_enable = _make_definer("TPL_ENABLE_")
 
+        plato_profile = spec.satisfies("profile=plato")
+
         # #################### Base Settings #######################
 
         options.extend(
@@ -611,16 +758,29 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
                 define_trilinos_enable("CXX11", True),
                 define_trilinos_enable("DEBUG", "debug"),
                 define_trilinos_enable("EXAMPLES", False),
-                define_trilinos_enable("SECONDARY_TESTED_CODE", True),
+                define_trilinos_enable("SECONDARY_TESTED_CODE", not plato_profile),
                 define_trilinos_enable("TESTS", False),
                 define_trilinos_enable("Fortran"),
                 define_trilinos_enable("OpenMP"),
                 define_trilinos_enable(
                     "EXPLICIT_INSTANTIATION", "explicit_template_instantiation"
                 ),
+                define_from_variant("CMAKE_INTERPROCEDURAL_OPTIMIZATION", "ipo"),
             ]
         )
 
+        if "+ipo" in spec:
+            # TriBITS calls cmake_minimum_required with an old version, so
+            # CMP0069 has to be forced for CMAKE_INTERPROCEDURAL_OPTIMIZATION
+            # to be honored.
+            options.append(define("CMAKE_POLICY_DEFAULT_CMP0069", "NEW"))
+
+        # Trilinos has no training of its own: instrumented libraries record
+        # profiles while a dependent (e.g. platoanalyze pgo=generate) runs.
+        options.extend(self.compiler_launcher_args())
+        options.extend(self.pgo_args())
+        options.extend(self.unity_build_args())
+
         if spec.version >= Version("13"):
             options.append(define_from_variant("CMAKE_CXX_STANDARD", "cxxstd"))
         else:
@@ -680,7 +840,7 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
                 define_trilinos_enable("Thyra"),
                 define_trilinos_enable("Tpetra"),
                 define_trilinos_enable("TrilinosCouplings"),
-                define_trilinos_enable("Triutils", True),
+                define_trilinos_enable("Triutils", not plato_profile),
                 define_trilinos_enable("Zoltan"),
                 define_trilinos_enable("Zoltan2"),
                 define_from_variant("EpetraExt_BUILD_BTF", "epetraextbtf"),
@@ -714,6 +874,9 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
             )
 
         if "+exodus" in spec:
+            # Added by Plato: a pre-installed SEACAS is found through
+            # SEACASConfig.cmake instead of being built
+            options.append(define_tpl_enable("SEACAS", "+external_seacas" in spec))
             options.extend(
                 [
                     define_trilinos_enable("SEACAS", True),
@@ -826,9 +989,28 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
         for tpl_name, dep_name in tpl_dep_map:
             define_tpl(tpl_name, dep_name, dep_name in spec)
 
+        # Added by Plato: vendor kernels for KokkosKernels (SpMV, SpGEMM,
+        # triangular solves used by MueLu/Ifpack2)
+        if "+kokkoskernels_tpls" in spec:
+            have_mkl = spec["blas"].name in ("intel-mkl", "intel-oneapi-mkl")
+            define_tpl("MKL", "blas", have_mkl)
+            options.extend(
+                [
+                    define("KokkosKernels_ENABLE_TPL_BLAS", True),
+                    define("KokkosKernels_ENABLE_TPL_LAPACK", True),
+                    define("KokkosKernels_ENABLE_TPL_MKL", have_mkl),
+                    define_tpl_enable("CUBLAS", "cuda"),
+                    define_tpl_enable("CUSPARSE", "cuda"),
+                    define("KokkosKernels_ENABLE_TPL_CUBLAS", "+cuda" in spec),
+                    define("KokkosKernels_ENABLE_TPL_CUSPARSE", "+cuda" in spec),
+                ]
+            )
+
         # External Kokkos
-        if spec.satisfies("@14.4.0 +kokkos"):
-            options.append(define_tpl_enable("Kokkos"))
+        if spec.satisfies("@14.4.0 +kokkos") or "+external_kokkoskernels" in spec:
+            options.append(define_tpl_enable("Kokkos", True))
+        if "+external_kokkoskernels" in spec: # Added by Plato
+            options.append(define_tpl_enable("KokkosKernels", True))
 
         # MPI settings
         options.append(define_tpl_enable("MPI"))
@@ -890,23 +1072,29 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
 
         options.extend(
             [
-                define("Teuchos_ENABLE_COMPLEX", complex_s), 
+                define("Teuchos_ENABLE_COMPLEX", complex_s),
                 define("Teuchos_ENABLE_FLOAT", float_s),
-                # Added by Plato
-                define('Kokkos_ARCH_BDW', False), # added by Plato
-                define('Kokkos_ARCH_HSW', False) # added by Plato
             ]
         )
 
         if "+tpetra +explicit_template_instantiation" in spec:
-            options.append(define_from_variant("Tpetra_INST_OPENMP", "openmp"))
+            if plato_profile:
+                # Only instantiate the node Plato runs on: the device when
+                # there is one, otherwise OpenMP or Serial
+                device_s = "+cuda" in spec or "+rocm" in spec
+                openmp_s = "+openmp" in spec and not device_s
+                serial_s = not (device_s or openmp_s)
+                options.append(define("Tpetra_INST_OPENMP", openmp_s))
+            else:
+                serial_s = True
+                options.append(define_from_variant("Tpetra_INST_OPENMP", "openmp"))
             options.extend(
                 [
                     define("Tpetra_INST_DOUBLE", True),
                     define("Tpetra_INST_COMPLEX_DOUBLE", complex_s),
                     define("Tpetra_INST_COMPLEX_FLOAT", float_s and complex_s),
                     define("Tpetra_INST_FLOAT", float_s),
-                    define("Tpetra_INST_SERIAL", True),
+                    define("Tpetra_INST_SERIAL", serial_s),
                 ]
             )
 
@@ -932,6 +1120,8 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
         # ################# Kokkos ######################
 
         if "+kokkos" in spec:
+            # The host SIMD architecture follows the spec target; nothing
+            # else may force Kokkos_ARCH_* host options
             arch = Kokkos.get_microarch(spec.target)
             if arch:
                 options.append(define("Kokkos_ARCH_" + arch.upper(), True))
@@ -941,8 +1131,13 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
                 [
                     define_kok_enable("CUDA"),
                     define_kok_enable("OPENMP" if spec.version >= Version("13") else "OpenMP"),
+                    define_kok_enable("AGGRESSIVE_VECTORIZATION", "simd"),
                 ]
             )
+            if "+profiling" in spec:
+                # Kokkos Tools are loaded through libdl, which Kokkos enables
+                # by default; only make sure nothing turned it off
+                options.append(define_kok_enable("LIBDL", True))
             if "+cuda" in spec:
                 use_uvm = "+uvm" in spec
                 options.extend(
@@ -1007,11 +1202,76 @@ class Trilinos(CMakePackage, CudaPackage, ROCmPackage):
             )
             filter_file(r"-lpytrilinos", "", "%s/Makefile.export.Trilinos" % self.prefix.include)
 
+    @run_after("install")
+    def install_omp_launcher(self):
+        # Wrapper exporting per-rank OpenMP thread counts and affinity
+        if not self.spec.satisfies("+openmp ^hwloc"):
+            return
+        launcher = join_path(self.prefix.bin, "trilinos-omp-launch")
+        mkdirp(self.prefix.bin)
+        install(join_path(self.package_dir, "omp-launch.sh"), launcher)
+        filter_file("@HWLOC_CALC@", self.spec["hwloc"].prefix.bin.join("hwloc-calc"), launcher)
+        set_executable(launcher)
+
     def setup_run_environment(self, env):
         if "+exodus" in self.spec:
             env.prepend_path("PYTHONPATH", self.prefix.lib)
 
-        if "+cuda" in self.spec:
-            # currently Trilinos doesn't perform the memory fence so
-            # it relies on blocking CUDA kernel launch.
+        self._setup_blas_threads_environment(env)
+
+        if self.spec.satisfies("+cuda +cuda_launch_blocking"):
             env.set("CUDA_LAUNCH_BLOCKING", "1")
+
+        if "+profiling" in self.spec:
+            self._setup_kokkos_tools_environment(env)
+
+    def test(self):
+        if "+tpetra" in self.spec:
+            self._test_tpetra_link()
+            if self.spec.satisfies("+openmp ^hwloc"):
+                self._test_openmp_affinity()
+
+    def _test_tpetra_link(self):
+        """Build a small Tpetra program against the installed CMake config"""
+        src_dir = join_path(self.package_dir, "test", "tpetra_link")
+        build_dir = join_path(os.getcwd(), "tpetra_link_build")
+        cmake = self.spec["cmake"].prefix.bin.cmake
+
+        options = [
+            "-S",
+            src_dir,
+            "-B",
+            build_dir,
+            self.define("Trilinos_ROOT", self.prefix),
+            self.define_from_variant("CMAKE_INTERPROCEDURAL_OPTIMIZATION", "ipo"),
+        ]
+        self.run_test(cmake, options, purpose="configuring Tpetra program with installed Trilinos")
+        self.run_test(cmake, ["--build", build_dir], purpose="linking Tpetra program")
+
+        exe = join_path(build_dir, "tpetra_link")
+        self.run_test(exe, [], "PASSED", purpose="running Tpetra program")
+
+    def _test_openmp_affinity(self):
+        """Compare Tpetra throughput with bound and unbound OpenMP threads"""
+        exe = join_path(os.getcwd(), "tpetra_link_build", "tpetra_link")
+        if not os.path.isfile(exe):
+            print("Skipping the OpenMP affinity test: tpetra_link was not built")
+            return
+        args = ["200", "4000000"]
+
+        unbound = Executable(exe)
+        unbound.add_default_env("OMP_PROC_BIND", "false")
+        unbound_out = unbound(*args, output=str)
+
+        bound = Executable(join_path(self.prefix.bin, "trilinos-omp-launch"))
+        bound_out = bound(exe, *args, output=str)
+
+        rates = {}
+        for label, out in (("unbound", unbound_out), ("bound", bound_out)):
+            rate = [line for line in out.splitlines() if line.startswith("iterations/s")]
+            assert rate, "no throughput reported by the {0} run".format(label)
+            rates[label] = float(rate[0].split()[1])
+            print("{0} OpenMP threads: {1}".format(label, rate[0]))
+
+        # Only reported: on shared nodes the ratio is subject to noise
+        print("bound/unbound throughput: {0:.2f}".format(rates["bound"] / rates["unbound"]))
@@ -0,0 +1,58 @@
+// Smoke test linking a small Tpetra program against an installed Trilinos.
+#include <Tpetra_Core.hpp>
+#include <Tpetra_Map.hpp>
+#include <Tpetra_Vector.hpp>
+
+#include <chrono>
+#include <cmath>
+#include <cstdlib>
+#include <iostream>
+
+int main(int argc, char* argv[])
+{
+  Tpetra::ScopeGuard scope(&argc, &argv);
+  {
+    using map_type = Tpetra::Map<>;
+    using vector_type = Tpetra::Vector<>;
+    using global_ordinal_type = map_type::global_ordinal_type;
+
+    auto comm = Tpetra::getDefaultComm();
+    const Tpetra::global_size_t numGlobal = 1000 * comm->getSize();
+    const global_ordinal_type indexBase = 0;
+    auto map = Teuchos::rcp(new map_type(numGlobal, indexBase, comm));
+
+    vector_type x(map);
+    x.putScalar(1.0);
+    const auto norm = x.norm2();
+    if (std::abs(norm - std::sqrt(static_cast<double>(numGlobal))) > 1.0e-8) {
+      std::cerr << "FAILED: unexpected norm " << norm << std::endl;
+      return 1;
+    }
+    if (comm->getRank() == 0) {
+      std::cout << "PASSED" << std::endl;
+    }
+
+    // Optional throughput measurement: tpetra_link <iterations> <local size>
+    if (argc > 2) {
+      const int iterations = std::atoi(argv[1]);
+      const Tpetra::global_size_t numBench = std::atol(argv[2]) * comm->getSize();
+      auto benchMap = Teuchos::rcp(new map_type(numBench, indexBase, comm));
+      vector_type a(benchMap), b(benchMap);
+      a.putScalar(1.0);
+      b.putScalar(2.0);
+
+      const auto start = std::chrono::steady_clock::now();
+      double sum = 0.0;
+      for (int i = 0; i < iterations; ++i) {
+        b.update(1.0e-6, a, 1.0);
+        sum += b.dot(a);
+      }
+      const std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+      if (comm->getRank() == 0) {
+        std::cout << "iterations/s: " << iterations / elapsed.count() << " (" << sum << ")"
+                  << std::endl;
+      }
+    }
+  }
+  return 0;
+}